@@ -17,18 +17,109 @@ numpy==1.25.2
 requests==2.31.0
 python-dateutil==2.8.2
 APScheduler==3.10.4
-from flask import Flask, render_template, jsonify
+from flask import Flask, render_template, jsonify, request
 import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import json
-from data.calculator import TradingCalculator
+import os
+import threading
+import time
+from apscheduler.schedulers.background import BackgroundScheduler
+from data.calculator import TradingCalculator, create_snapshot_cache
 
 app = Flask(__name__)
 
-# Inicializar calculadora
-calc = TradingCalculator()
+# Snapshot compartilhado entre workers; só o escritor instancia a calculadora
+SNAPSHOT_TTL = 60  # segundos: preço atual, probabilidades e alertas
+SNAPSHOT_MAX_AGE = 5 * 60  # segundos: acima disso o snapshot é reportado como desatualizado
+HISTORY_TTL = 24 * 60 * 60  # segundos: download do histórico de 5 anos
+MAX_BACKOFF = 15 * 60  # segundos
+snapshots = create_snapshot_cache(app.root_path)
+# Tabelas de excursão mudam só com o histórico: publicadas à parte, em binário
+excursions = create_snapshot_cache(app.root_path, 'excursions',
+                                   encode=lambda payload: payload,
+                                   decode=TradingCalculator.decode_excursions)
+calc = None
+refresh_failures = 0
+next_refresh_attempt = 0
+scheduler_pid = None
+scheduler_lock = threading.Lock()
+
+def refresh_snapshot():
+    """Job em segundo plano: só o processo escritor recalcula e publica"""
+    global calc, refresh_failures, next_refresh_attempt
+    if time.time() < next_refresh_attempt or not snapshots.acquire_writer():
+        return
+
+    try:
+        if calc is None:
+            calc = TradingCalculator()
+        elif calc.data.empty or calc.history_age() >= HISTORY_TTL:
+            calc.refresh_data()
+        if calc.data.empty:
+            raise RuntimeError('Histórico vazio')
+
+        published = excursions.read()
+        if (published is None or published[1]['loaded_at'] != calc.loaded_at) and excursions.acquire_writer():
+            excursions.write(calc.encode_excursions())
+
+        current = snapshots.read()
+        snapshots.write(calc.build_snapshot(current[1] if current else None))
+        refresh_failures = 0
+    except Exception:
+        # Mantém o snapshot anterior publicado e espera antes de tentar de novo
+        refresh_failures += 1
+        delay = min(SNAPSHOT_TTL * 2 ** refresh_failures, MAX_BACKOFF)
+        next_refresh_attempt = time.time() + delay
+        app.logger.exception('Falha ao atualizar snapshot; nova tentativa em %ss', delay)
+
+def ensure_scheduler():
+    """Inicia o agendador uma vez por processo (também após o fork dos workers)"""
+    global scheduler_pid
+    with scheduler_lock:
+        if scheduler_pid == os.getpid():
+            return
+        scheduler = BackgroundScheduler(daemon=True)
+        scheduler.add_job(refresh_snapshot, 'interval', seconds=SNAPSHOT_TTL,
+                          next_run_time=datetime.now(), max_instances=1, coalesce=True)
+        scheduler.start()
+        scheduler_pid = os.getpid()
+
+def check_age(created_at, max_age):
+    if time.time() - created_at > max_age:
+        raise RuntimeError(f'Dados desatualizados desde {datetime.fromtimestamp(created_at).isoformat()}')
+
+def get_snapshot():
+    """Retorna (versão, snapshot); requisições apenas leem"""
+    ensure_scheduler()
+    current = snapshots.read()
+    if current is None:
+        raise RuntimeError('Snapshot ainda não disponível')
+    check_age(current[1]['created_at'], SNAPSHOT_MAX_AGE)
+    return current
+
+def get_snapshot_part(name):
+    """Retorna (metadados da versão, parte) ou levanta o erro registrado para ela"""
+    version, snapshot = get_snapshot()
+    if snapshot.get(name) is None:
+        raise RuntimeError(snapshot['errors'].get(name, f'{name} indisponível'))
+    return {'version': version, 'created_at': snapshot['created_at']}, snapshot[name]
+
+def get_excursion_tables():
+    """Retorna (metadados da versão, tabelas) já decodificadas para arrays"""
+    ensure_scheduler()
+    current = excursions.read()
+    if current is None:
+        raise RuntimeError('Tabelas de excursão ainda não disponíveis')
+    version, published = current
+    check_age(published['loaded_at'], 2 * HISTORY_TTL)
+    return {'version': version, 'created_at': published['loaded_at']}, published['tables']
+
+# Começa a montar o snapshot antes do primeiro request; com preload do
+# gunicorn, cada worker inicia o próprio agendador no primeiro request
+ensure_scheduler()
 
 @app.route('/')
 def index():
@@ -37,39 +128,54 @@ def index():
 @app.route('/api/current_price')
 def get_current_price():
     try:
-        ticker = yf.Ticker("ABEV3.SA")
-        data = ticker.history(period="1d", interval="1m")
-        if not data.empty:
-            current_price = float(data['Close'].iloc[-1])
-            return jsonify({
-                'success': True,
-                'price': round(current_price, 2),
-                'timestamp': datetime.now().isoformat()
-            })
+        meta, current_price = get_snapshot_part('current_price')
+        return jsonify({
+            'success': True,
+            **meta,
+            'price': round(current_price, 2),
+            'timestamp': datetime.fromtimestamp(meta['created_at']).isoformat()
+        })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/alerts')
 def get_alerts():
     try:
-        alerts = calc.check_alerts()
-        return jsonify({'success': True, 'alerts': alerts})
+        meta, alerts = get_snapshot_part('alerts')
+        return jsonify({'success': True, **meta, 'alerts': alerts})
     except Exception as e:
-        return jsonResponse({'success': False, 'error': str(e)})
+        return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/probabilities')
 def get_probabilities():
     try:
-        probabilities = calc.calculate_range_probabilities()
-        return jsonify({'success': True, 'probabilities': probabilities})
+        meta, probabilities = get_snapshot_part('probabilities')
+        return jsonify({'success': True, **meta, 'probabilities': probabilities})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/reversal_probabilities')
 def get_reversal_probabilities():
     try:
-        reversals = calc.calculate_reversal_probabilities()
-        return jsonify({'success': True, 'reversals': reversals})
+        meta, reversals = get_snapshot_part('reversals')
+        return jsonify({'success': True, **meta, 'reversals': reversals})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/touch_probability')
+def get_touch_probability():
+    try:
+        percent = float(request.args.get('percent', 5))
+        days = int(request.args.get('days', 21))
+        meta, tables = get_excursion_tables()
+        return jsonify({
+            'success': True,
+            **meta,
+            'percent': percent,
+            'days': days,
+            'up': TradingCalculator.touch_probability(tables, percent, days, 'up'),
+            'down': TradingCalculator.touch_probability(tables, percent, days, 'down')
+        })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -80,12 +186,33 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta, date
 import calendar
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
 
 class TradingCalculator:
+    MAX_HORIZON = 42  # ~42 dias úteis (ciclo bimestral)
+
     def __init__(self):
         self.ticker = "ABEV3.SA"
+        self.refresh_data()
+
+    def refresh_data(self):
+        """Recarrega o histórico e as tabelas de excursão derivadas dele"""
         self.data = self.load_historical_data()
-        
+        self.excursion_tables = self.build_excursion_tables()
+        self.loaded_at = time.time()
+
+    def history_age(self):
+        """Segundos desde o último download do histórico"""
+        return time.time() - self.loaded_at
+
     def load_historical_data(self):
         """Carrega dados históricos de 5 anos"""
         try:
@@ -95,7 +222,57 @@ class TradingCalculator:
         except Exception as e:
             print(f"Erro ao carregar dados: {e}")
             return pd.DataFrame()
-    
+
+    def build_excursion_tables(self):
+        """Pré-calcula excursões máximas de alta e de baixa (1 a 42 dias)"""
+        if self.data.empty:
+            return {}
+
+        opens = self.data['Open'].to_numpy(dtype=float)
+        highs = self.data['High'].to_numpy(dtype=float)
+        lows = self.data['Low'].to_numpy(dtype=float)
+        n = len(opens)
+
+        # Máxima/mínima acumulada da janela [i, i + horizonte) para cada início i
+        max_high = highs.copy()
+        min_low = lows.copy()
+        tables = {}
+        for horizon in range(1, min(self.MAX_HORIZON, n) + 1):
+            valid = n - horizon + 1
+            if horizon > 1:
+                max_high[:valid] = np.maximum(max_high[:valid], highs[horizon - 1:])
+                min_low[:valid] = np.minimum(min_low[:valid], lows[horizon - 1:])
+
+            # Arrays ordenados: consultas de toque viram busca binária
+            tables[horizon] = {
+                'up': np.sort(max_high[:valid] / opens[:valid] - 1),
+                'down': np.sort(1 - min_low[:valid] / opens[:valid])
+            }
+
+        return tables
+
+    def calculate_touch_probability(self, percent, period_days, direction='up'):
+        """Probabilidade (%) de tocar +/- percent% dentro de period_days dias úteis"""
+        return self.touch_probability(self.excursion_tables, percent, period_days, direction)
+
+    @classmethod
+    def touch_probability(cls, excursion_tables, percent, period_days, direction='up'):
+        """Consulta tabelas de excursão já calculadas (locais ou de um snapshot)"""
+        if not 1 <= period_days <= cls.MAX_HORIZON:
+            raise ValueError(f"Horizonte deve estar entre 1 e {cls.MAX_HORIZON} dias")
+        if direction not in ('up', 'down'):
+            raise ValueError("Direção deve ser 'up' ou 'down'")
+        if not np.isfinite(percent) or percent < 0:
+            raise ValueError("Percentual deve ser um número finito e não negativo")
+
+        table = excursion_tables.get(period_days)
+        if not table or not len(table[direction]):
+            raise RuntimeError(f"Sem dados históricos para o horizonte de {period_days} dias")
+
+        excursions = table[direction]
+        touched = len(excursions) - np.searchsorted(excursions, percent / 100, side='left')
+        return round((touched / len(excursions)) * 100, 1)
+
     def get_current_price(self):
         """Obtém preço atual"""
         try:
@@ -159,9 +336,10 @@ class TradingCalculator:
             'percentile_80': np.percentile(ranges, 80)
         }
     
-    def calculate_range_probabilities(self):
+    def calculate_range_probabilities(self, current_price=None):
         """Calcula probabilidades de ranges"""
-        current_price = self.get_current_price()
+        if current_price is None:
+            current_price = self.get_current_price()
         cycles = self.get_option_cycle_dates()
         
         # Calcular para diferentes períodos
@@ -213,7 +391,6 @@ class TradingCalculator:
         if self.data.empty:
             return {}
         
-        current_price = self.get_current_price()
         cycles = self.get_option_cycle_dates()
         
         # Simular probabilidades baseadas em dados históricos
@@ -261,10 +438,9 @@ class TradingCalculator:
             }
         }
     
-    def check_alerts(self):
-        """Verifica condições de alerta"""
+    def check_alerts(self, reversals=None):
+        """Verifica condições de alerta (reaproveita reversões já calculadas)"""
         alerts = []
-        current_price = self.get_current_price()
         
         if self.data.empty:
             return alerts
@@ -281,7 +457,8 @@ class TradingCalculator:
         
         if today_range >= avg_daily_range * 0.8:
             cycles = self.get_option_cycle_dates()
-            reversals = self.calculate_reversal_probabilities()
+            if reversals is None:
+                reversals = self.calculate_reversal_probabilities()
             
             alerts.append({
                 'type': 'range_alert',
@@ -293,6 +470,234 @@ class TradingCalculator:
             })
         
         return alerts
+
+    def encode_excursions(self):
+        """Tabelas de excursão em binário: cabeçalho JSON + float64 concatenados"""
+        horizons = sorted(self.excursion_tables)
+        header = json.dumps({
+            'loaded_at': self.loaded_at,
+            'horizons': [[h, len(self.excursion_tables[h]['up'])] for h in horizons]
+        }).encode('utf-8')
+        arrays = [self.excursion_tables[h][direction] for h in horizons for direction in ('up', 'down')]
+        body = np.concatenate(arrays).astype('<f8').tobytes() if arrays else b''
+        return struct.pack('<Q', len(header)) + header + body
+
+    @staticmethod
+    def decode_excursions(payload):
+        """Inverso de encode_excursions; os arrays são views sobre o payload"""
+        header_size = struct.unpack_from('<Q', payload, 0)[0]
+        header = json.loads(payload[8:8 + header_size])
+        values = np.frombuffer(payload, dtype='<f8', offset=8 + header_size)
+        tables = {}
+        offset = 0
+        for horizon, size in header['horizons']:
+            tables[horizon] = {
+                'up': values[offset:offset + size],
+                'down': values[offset + size:offset + 2 * size]
+            }
+            offset += 2 * size
+        return {'loaded_at': header['loaded_at'], 'tables': tables}
+
+    def build_snapshot(self, previous=None):
+        """Calcula os resultados que dependem do preço atual em um único snapshot.
+
+        O preço é buscado uma vez e reaproveitado. Cada parte é protegida: se
+        uma falhar, mantém o valor do snapshot anterior (se houver) e registra
+        o erro em 'errors'. As tabelas de excursão são publicadas à parte.
+        """
+        previous = previous or {}
+        snapshot = {'created_at': time.time(), 'errors': {}}
+
+        def build_part(name, compute):
+            try:
+                snapshot[name] = compute()
+            except Exception as e:
+                print(f"Erro ao calcular {name}: {e}")
+                snapshot[name] = previous.get(name)
+                if snapshot[name] is None:
+                    snapshot['errors'][name] = str(e)
+            return snapshot[name]
+
+        def fetch_price():
+            price = self.get_current_price()
+            if not price:
+                raise RuntimeError('Preço atual indisponível')
+            return price
+
+        def require_price():
+            if current_price is None:
+                raise RuntimeError('Preço atual indisponível')
+            return current_price
+
+        current_price = build_part('current_price', fetch_price)
+        reversals = build_part('reversals', self.calculate_reversal_probabilities)
+        build_part('probabilities', lambda: self.calculate_range_probabilities(require_price()))
+        build_part('alerts', lambda: self.check_alerts(reversals))
+        return snapshot
+
+
+def encode_json(snapshot):
+    return json.dumps(snapshot).encode('utf-8')
+
+
+class MmapSnapshotCache:
+    """Snapshot versionado compartilhado entre processos via arquivo mapeado em memória.
+
+    A leitura não usa lock (seqlock: número de sequência ímpar indica escrita em
+    andamento). Apenas o processo que detém o flock do arquivo .lock escreve.
+    Uma única instância é compartilhada pelas threads do processo: cada leitura
+    usa uma referência local ao mapa, e um remapeamento nunca fecha o mapa
+    antigo, que é liberado quando a última leitura em andamento o solta.
+    O payload é convertido por encode/decode (JSON por padrão) e decodificado
+    uma única vez por versão em cada processo.
+    """
+    HEADER = struct.Struct('<QQ')  # sequência, tamanho do payload
+    READ_RETRIES = 100
+
+    def __init__(self, path, capacity=4 * 1024 * 1024, encode=encode_json, decode=json.loads):
+        self.path = path
+        self.encode = encode
+        self.decode = decode
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < self.HEADER.size + capacity:
+            os.ftruncate(self._fd, self.HEADER.size + capacity)
+        self._map = mmap.mmap(self._fd, 0)
+        self._lock = threading.Lock()
+        self._lock_fd = None
+        self._writer_pid = None
+        self._cached = (None, None)  # (sequência, (versão, snapshot))
+
+    def _remap(self, needed):
+        """Troca o mapa por um que cubra o arquivo atual (raro: só quando cresce)"""
+        with self._lock:
+            if len(self._map) < needed:
+                self._map = mmap.mmap(self._fd, 0)
+            return self._map
+
+    def is_writer(self):
+        return self._lock_fd is not None and self._writer_pid == os.getpid()
+
+    def acquire_writer(self):
+        """Tenta tornar este processo o escritor designado (não bloqueia)"""
+        with self._lock:
+            if self.is_writer():
+                return True
+            if self._lock_fd is not None:
+                # Descritor herdado via fork: o lock continua sendo do processo pai
+                os.close(self._lock_fd)
+                self._lock_fd = None
+            fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            # Mantido aberto até o fim do processo; se ele morrer, outro assume
+            self._lock_fd = fd
+            self._writer_pid = os.getpid()
+            return True
+
+    def read(self):
+        """Retorna (versão, snapshot) sem lock, ou None se nada foi publicado"""
+        view = self._map
+        for _ in range(self.READ_RETRIES):
+            sequence, size = self.HEADER.unpack_from(view, 0)
+            if sequence == 0:
+                return None
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            cached_sequence, cached = self._cached
+            if sequence == cached_sequence:
+                return cached
+
+            if self.HEADER.size + size > len(view):
+                view = self._remap(self.HEADER.size + size)
+                continue
+            payload = view[self.HEADER.size:self.HEADER.size + size]
+            if self.HEADER.unpack_from(view, 0)[0] != sequence:
+                continue
+
+            result = (sequence // 2, self.decode(payload))
+            self._cached = (sequence, result)
+            return result
+
+        # Escrita em andamento demorou demais: serve a última cópia válida
+        return self._cached[1]
+
+    def write(self, snapshot):
+        """Publica um novo snapshot; só pode ser chamado pelo escritor"""
+        if not self.is_writer():
+            raise RuntimeError("Processo não é o escritor do snapshot")
+
+        payload = self.encode(snapshot)
+        needed = self.HEADER.size + len(payload)
+        view = self._map
+
+        # Marca escrita em andamento antes de qualquer mudança no arquivo
+        sequence = self.HEADER.unpack_from(view, 0)[0]
+        sequence += 1 if sequence % 2 == 0 else 0
+        struct.pack_into('<Q', view, 0, sequence)
+
+        if needed > len(view):
+            # Só cresce: outro escritor anterior pode ter deixado o arquivo maior
+            file_size = os.fstat(self._fd).st_size
+            if needed > file_size:
+                os.ftruncate(self._fd, max(file_size, self.HEADER.size + 2 * len(payload)))
+            view = self._remap(needed)
+
+        view[self.HEADER.size:needed] = payload
+        self.HEADER.pack_into(view, 0, sequence, len(payload))
+        struct.pack_into('<Q', view, 0, sequence + 1)
+        return (sequence + 1) // 2
+
+
+class LocalSnapshotCache:
+    """Substituto local de um cache externo, com a mesma interface do mmap.
+
+    Serve para um único processo (desenvolvimento ou testes); os snapshots
+    passam por encode/decode como passariam por um cache externo.
+    """
+
+    def __init__(self, encode=encode_json, decode=json.loads):
+        self.encode = encode
+        self.decode = decode
+        self._lock = threading.Lock()
+        self._current = None
+
+    def acquire_writer(self):
+        return True
+
+    def read(self):
+        return self._current
+
+    def write(self, snapshot):
+        data = self.decode(self.encode(snapshot))
+        with self._lock:
+            version = self._current[0] + 1 if self._current else 1
+            self._current = (version, data)
+        return version
+
+
+def create_snapshot_cache(app_dir, name='snapshot', encode=encode_json, decode=json.loads):
+    """Escolhe o cache pelo ambiente: SNAPSHOT_CACHE=mmap (padrão) ou local.
+
+    Sem SNAPSHOT_PATH, o arquivo do mmap é derivado do diretório da aplicação,
+    para que instalações distintas no mesmo host não compartilhem snapshot.
+    Caches adicionais (name) usam arquivos ao lado do principal.
+    """
+    backend = os.environ.get('SNAPSHOT_CACHE', 'mmap')
+    if backend == 'local':
+        return LocalSnapshotCache(encode, decode)
+    if backend == 'mmap':
+        path = os.environ.get('SNAPSHOT_PATH')
+        if not path:
+            app_id = hashlib.sha1(os.path.abspath(app_dir).encode('utf-8')).hexdigest()[:12]
+            path = os.path.join(tempfile.gettempdir(), f'abev3_snapshot_{app_id}.bin')
+        if name != 'snapshot':
+            path = f'{path}.{name}'
+        return MmapSnapshotCache(path, encode=encode, decode=decode)
+    raise ValueError(f"Cache de snapshot desconhecido: {backend}")
         <!DOCTYPE html>
 <html lang="pt-BR">
 <head>